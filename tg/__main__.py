@@ -63,6 +63,7 @@ def main() -> None:
         phone=config.PHONE,
         database_encryption_key=config.ENC_KEY,
         files_directory=config.FILES_DIR,
+        use_message_database=config.USE_MESSAGE_DATABASE,
         tdlib_verbosity=config.TDLIB_VERBOSITY,
         library_path=config.TDLIB_PATH,
     )
@@ -48,6 +48,8 @@ def get_color(fg: int, bg: int) -> int:
             except curses.error:
                 # If this fails too, colors are probably not supported
                 pass
-        COLOR_PAIRS[key] = size
+        # keep attr of the pair, so curses.color_pair is called only once
+        # per combination instead of on every drawn item
+        COLOR_PAIRS[key] = curses.color_pair(size)
 
-    return curses.color_pair(COLOR_PAIRS[key])
+    return COLOR_PAIRS[key]
@@ -4,23 +4,25 @@ overwritten by external config file
 """
 import os
 import platform
-import runpy
-from typing import Dict, Optional
+import stat
+from importlib.machinery import SourceFileLoader
+from typing import Any, Dict, Optional
 
 _os_name = platform.system()
 _darwin = "Darwin"
 _linux = "Linux"
+_home = os.path.expanduser("~")
 
 
-CONFIG_DIR = os.path.expanduser("~/.config/tg/")
+CONFIG_DIR = os.path.join(_home, ".config/tg/")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "conf.py")
-FILES_DIR = os.path.expanduser("~/.cache/tg/")
+FILES_DIR = os.path.join(_home, ".cache/tg/")
 MAILCAP_FILE: Optional[str] = None
 
 LOG_LEVEL = "INFO"
-LOG_PATH = os.path.expanduser("~/.local/share/tg/")
+LOG_PATH = os.path.join(_home, ".local/share/tg/")
 
-API_ID = "559815"
+API_ID = 559815
 API_HASH = "fd121358f59d764c57c55871aa0807ca"
 
 PHONE = None
@@ -28,6 +30,9 @@ ENC_KEY = ""
 
 TDLIB_PATH = None
 TDLIB_VERBOSITY = 0
+# keep msgs in tdlib database, so chats open without network requests for
+# msgs that were already loaded
+USE_MESSAGE_DATABASE = True
 
 MAX_DOWNLOAD_SIZE = "10MB"
 
@@ -37,31 +42,25 @@ NOTIFY_CMD = "/usr/local/bin/terminal-notifier -title {title} -subtitle {subtitl
 VIEW_TEXT_CMD = "less"
 FZF = "fzf"
 
-if _os_name == _linux:
-    # for more info see https://trac.ffmpeg.org/wiki/Capture/ALSA
-    VOICE_RECORD_CMD = (
-        "ffmpeg -f alsa -i hw:0 -c:a libopus -b:a 32k {file_path}"
-    )
-else:
-    VOICE_RECORD_CMD = (
-        "ffmpeg -f avfoundation -i ':0' -c:a libopus -b:a 32k {file_path}"
-    )
-
 # TODO: use mailcap instead of editor
 LONG_MSG_CMD = "vim + -c 'startinsert' {file_path}"
 EDITOR = os.environ.get("EDITOR", "vi")
 
 if _os_name == _linux:
+    # for more info see https://trac.ffmpeg.org/wiki/Capture/ALSA
+    VOICE_RECORD_CMD = (
+        "ffmpeg -f alsa -i hw:0 -c:a libopus -b:a 32k {file_path}"
+    )
     DEFAULT_OPEN = "xdg-open {file_path}"
-else:
-    DEFAULT_OPEN = "open {file_path}"
-
-if _os_name == _linux:
     if os.environ.get("WAYLAND_DISPLAY"):
         COPY_CMD = "wl-copy"
     else:
         COPY_CMD = "xclip -selection c"
 else:
+    VOICE_RECORD_CMD = (
+        "ffmpeg -f avfoundation -i ':0' -c:a libopus -b:a 32k {file_path}"
+    )
+    DEFAULT_OPEN = "open {file_path}"
     COPY_CMD = "pbcopy"
 
 CHAT_FLAGS: Dict[str, str] = {}
@@ -78,13 +77,25 @@ KEEP_MEDIA = 7
 
 FILE_PICKER_CMD = "ranger --choosefile={file_path}"
 
-DOWNLOAD_DIR = os.path.expanduser("~/Downloads/")
-
-if os.path.isfile(CONFIG_FILE):
-    config_params = runpy.run_path(CONFIG_FILE)  # type: ignore
-    for param, value in config_params.items():
-        if param.isupper():
-            globals()[param] = value
+DOWNLOAD_DIR = os.path.join(_home, "Downloads/")
+
+try:
+    _config_mode = os.stat(CONFIG_FILE).st_mode
+except FileNotFoundError:
+    _config_mode = 0
+
+if stat.S_ISREG(_config_mode):
+    # exec config directly, runpy machinery is not needed for a plain file
+    # with assignments. Source loader keeps compiled config in __pycache__
+    # and recompiles it only when file mtime or size changes
+    config_code = SourceFileLoader("conf", CONFIG_FILE).get_code("conf")
+    config_params: Dict[str, Any] = {"__file__": CONFIG_FILE}
+    exec(config_code, config_params)  # type: ignore
+    globals().update(
+        (param, value)
+        for param, value in config_params.items()
+        if param.isupper()
+    )
 else:
     os.makedirs(CONFIG_DIR, exist_ok=True)
 
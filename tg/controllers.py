@@ -1,11 +1,25 @@
 import logging
 import os
 import shlex
-from datetime import datetime
-from functools import partial, wraps
-from queue import Queue
-from tempfile import NamedTemporaryFile
-from typing import Any, Callable, Dict, List, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
+from operator import attrgetter
+from queue import Full, Queue
+from tempfile import gettempdir, mkstemp
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from telegram.utils import AsyncResult
 
@@ -33,10 +47,38 @@ log = logging.getLogger(__name__)
 # cause blan areas on the msg display screen
 MSGS_LEFT_SCROLL_THRESHOLD = 2
 REPLY_MSG_PREFIX = "# >"
-HandlerType = Callable[[Any], Optional[str]]
+# msgs of a chat arrived in less than this number of seconds after previous
+# notification for it, e.g. when tdlib sends missed msgs, are notified about
+# together once interval passes
+NOTIFY_BURST_INTERVAL = 0.5
+# terminal is resized only when no SIGWINCH came for this number of seconds
+RESIZE_DEBOUNCE = 0.05
+# draw loop doesn't redraw screen more often than this number of times per
+# second, during bursts of updates they are drawn together
+MAX_FPS = 60
+# values returned by handlers to leave current mode
+QUIT = 1
+BACK = 2
+HandlerType = Callable[[Any], Optional[int]]
+# chat title, sender, text and number of msgs to notify about
+PendingNotification = Tuple[str, str, str, int]
 
 chat_handler: Dict[str, HandlerType] = {}
 msg_handler: Dict[str, HandlerType] = {}
+# id of bindings dict -> formatted help, bindings are filled on import and
+# don't change after that
+help_cache: Dict[int, str] = {}
+# id of bindings dict -> beginnings of its multichar keybindings, after
+# reading one of them more keys are read to complete the binding
+prefixes_cache: Dict[int, FrozenSet[str]] = {}
+# handlers that take repeat_factor, e.g. next_msg
+repeat_handlers: Set[HandlerType] = set()
+# runs blocking work, e.g. probing media files with ffprobe, in parallel
+executor = ThreadPoolExecutor(max_workers=4)
+
+
+def noop(*args: Any) -> None:
+    """handler for keys that aren't bound to anything"""
 
 
 def bind(
@@ -48,11 +90,7 @@ def bind(
 
     def decorator(fun: Callable) -> HandlerType:
         @wraps(fun)
-        def wrapper(*args: Any, **kwargs: Any) -> Any:
-            return fun(*args, **kwargs)
-
-        @wraps(fun)
-        def _no_repeat_factor(self: "Controller", _: bool) -> Optional[str]:
+        def _no_repeat_factor(self: "Controller", _: bool) -> Optional[int]:
             return fun(self)
 
         for key in keys:
@@ -61,19 +99,76 @@ def bind(
             ), f"Key {key} already binded to {binding[key]}"
             binding[key] = fun if repeat_factor else _no_repeat_factor  # type: ignore
 
-        return wrapper
+        if repeat_factor:
+            repeat_handlers.add(fun)
+
+        # return function itself, so methods called directly, e.g.
+        # self.next_msg(10), don't go through extra wrapper
+        return fun
 
     return decorator
 
 
+def get_prefixes(binding: Dict[str, HandlerType]) -> FrozenSet[str]:
+    prefixes = prefixes_cache.get(id(binding))
+    if prefixes is None:
+        prefixes = prefixes_cache[id(binding)] = frozenset(
+            keys[:i]
+            for keys in binding
+            # ctrl keys, e.g. "^J", are read from terminal as single key
+            if not keys.startswith("^")
+            for i in range(1, len(keys))
+        )
+    return prefixes
+
+
 class Controller:
     def __init__(self, model: Model, view: View, tg: Tdlib) -> None:
         self.model = model
         self.view = view
         self.queue: Queue = Queue()
         self.is_running = True
+        self._resize_pending = False
+        self._resize_timer: Optional[threading.Timer] = None
+        # terminal size used by last resize
+        self._size = (0, 0)
+        self._render_chats_pending = False
+        self._render_msgs_pending = False
+        # renders skipped while view is suspended, e.g. when editor is open
+        self._render_after_resume = False
+        # chat id -> time of last notification for it
+        self._last_notify_time: Dict[int, float] = {}
+        # chat id -> msgs waiting for burst interval to pass
+        self._pending_notifications: Dict[int, PendingNotification] = {}
+        self._notify_lock = threading.Lock()
+        # notifications are sent from separate thread, so slow notify
+        # command or fetching unknown user doesn't block tdlib updates
+        self._notify_queue: Queue = Queue(maxsize=256)
+        notify_thread = threading.Thread(target=self._notify_loop)
+        notify_thread.daemon = True
+        notify_thread.start()
+        # latest status to draw, only the last one is visible anyway
+        self._status: Optional[Tuple[str, str]] = None
+        self._status_lock = threading.Lock()
         self.tg = tg
         self.chat_size = 0.5
+        # scratch file for external programs, created once and reused
+        fd, self._scratch_path = mkstemp(prefix="tg-", suffix=".txt")
+        os.close(fd)
+
+    @contextmanager
+    def scratch_file(self, text: str = "") -> Iterator[str]:
+        """
+        Yields path of scratch file filled with given text, it's used for
+        exchanging text with external programs, e.g. editor or file picker
+        """
+        with open(self._scratch_path, "w") as f:
+            f.write(text)
+        try:
+            yield self._scratch_path
+        finally:
+            # don't leave msg text on disk after it's used
+            open(self._scratch_path, "w").close()
 
     @bind(msg_handler, ["c"])
     def show_chat_info(self) -> None:
@@ -90,7 +185,7 @@ class Controller:
     @bind(msg_handler, ["u"])
     def show_user_info(self) -> None:
         """Show user profile"""
-        msg = MsgProxy(self.model.current_msg)
+        msg = self.model.current_msg_proxy
         user_id = msg.sender_id
         info = self.model.get_user_info(user_id)
 
@@ -102,10 +197,10 @@ class Controller:
 
     @bind(msg_handler, ["O"])
     def save_file_in_folder(self) -> None:
-        chat_id = self.model.chats.id_by_index(self.model.current_chat)
+        chat_id = self.model.current_chat_id
         if not chat_id:
             return
-        msg_ids = self.model.selected[chat_id]
+        msg_ids = sorted(self.model.selected[chat_id])
         if not msg_ids:
             msg = self.model.current_msg
             msg_ids = [msg["id"]]
@@ -116,22 +211,10 @@ class Controller:
 
     @bind(msg_handler, ["o"])
     def open_url(self) -> None:
-        msg = MsgProxy(self.model.current_msg)
+        msg = self.model.current_msg_proxy
         if not msg.is_text:
             return self.present_error("Does not contain urls")
-        text = msg["content"]["text"]["text"]
-        urls = []
-        for entity in msg["content"]["text"]["entities"]:
-            _type = entity["type"]["@type"]
-            if _type == "textEntityTypeUrl":
-                offset = entity["offset"]
-                length = entity["length"]
-                url = text[offset : offset + length]
-            elif _type == "textEntityTypeTextUrl":
-                url = entity["type"]["url"]
-            else:
-                continue
-            urls.append(url)
+        urls = msg.urls
         if not urls:
             return self.present_error("No url to open")
         if len(urls) == 1:
@@ -145,10 +228,14 @@ class Controller:
 
     @staticmethod
     def format_help(bindings: Dict[str, HandlerType]) -> str:
-        return "\n".join(
+        if _help := help_cache.get(id(bindings)):
+            return _help
+        _help = "\n".join(
             f"{key}\t{fun.__name__}\t{fun.__doc__ or ''}"
             for key, fun in sorted(bindings.items())
         )
+        help_cache[id(bindings)] = _help
+        return _help
 
     @bind(chat_handler, ["?"])
     def show_chat_help(self) -> None:
@@ -170,19 +257,19 @@ class Controller:
 
     @bind(chat_handler, ["q"])
     @bind(msg_handler, ["q"])
-    def quit(self) -> str:
-        return "QUIT"
+    def quit(self) -> int:
+        return QUIT
 
     @bind(msg_handler, ["h", "^D"])
-    def back(self) -> str:
-        return "BACK"
+    def back(self) -> int:
+        return BACK
 
     @bind(msg_handler, ["m"])
     def jump_to_reply_msg(self) -> None:
-        chat_id = self.model.chats.id_by_index(self.model.current_chat)
+        chat_id = self.model.current_chat_id
         if not chat_id:
             return
-        msg = MsgProxy(self.model.current_msg)
+        msg = self.model.current_msg_proxy
         if not msg.reply_msg_id:
             return self.present_error("This msg does not reply")
         if not self.model.msgs.jump_to_msg_by_id(chat_id, msg.reply_msg_id):
@@ -202,10 +289,11 @@ class Controller:
     @bind(msg_handler, ["y"])
     def yank_msgs(self) -> None:
         """Copy msgs to clipboard and internal buffer to forward"""
-        chat_id = self.model.chats.id_by_index(self.model.current_chat)
+        chat_id = self.model.current_chat_id
         if not chat_id:
             return
-        msg_ids = self.model.selected[chat_id]
+        # copy msgs in the order they were sent
+        msg_ids = sorted(self.model.selected[chat_id])
         if not msg_ids:
             msg = self.model.current_msg
             msg_ids = [msg["id"]]
@@ -215,15 +303,16 @@ class Controller:
         self.present_info(f"Copied {len(msg_ids)} msg(s)")
 
     def _toggle_select_msg(self) -> None:
-        chat_id = self.model.chats.id_by_index(self.model.current_chat)
+        chat_id = self.model.current_chat_id
         if not chat_id:
             return
-        msg = MsgProxy(self.model.current_msg)
+        msg = self.model.current_msg_proxy
 
-        if msg.msg_id in self.model.selected[chat_id]:
-            self.model.selected[chat_id].remove(msg.msg_id)
+        selected = self.model.selected[chat_id]
+        if msg.msg_id in selected:
+            selected.discard(msg.msg_id)
         else:
-            self.model.selected[chat_id].append(msg.msg_id)
+            selected.add(msg.msg_id)
 
     @bind(msg_handler, [" "])
     def toggle_select_msg_down(self) -> None:
@@ -241,10 +330,10 @@ class Controller:
 
     @bind(msg_handler, ["^G", "^["])
     def discard_selected_msgs(self) -> None:
-        chat_id = self.model.chats.id_by_index(self.model.current_chat)
+        chat_id = self.model.current_chat_id
         if not chat_id:
             return
-        self.model.selected[chat_id] = []
+        self.model.selected[chat_id] = set()
         self.render_msgs()
         self.present_info("Discarded selected messages")
 
@@ -296,15 +385,15 @@ class Controller:
         if chat_id is None:
             return
         reply_to_msg = self.model.current_msg_id
-        msg = MsgProxy(self.model.current_msg)
-        with NamedTemporaryFile("w+", suffix=".txt") as f, suspend(
+        msg = self.model.current_msg_proxy
+        with self.scratch_file(insert_replied_msg(msg)) as path, suspend(
             self.view
         ) as s:
-            f.write(insert_replied_msg(msg))
-            f.seek(0)
-            s.call(config.LONG_MSG_CMD.format(file_path=shlex.quote(f.name)))
-            with open(f.name) as f:
-                if replied_msg := strip_replied_msg(f.read().strip()):
+            s.call(config.LONG_MSG_CMD.format(file_path=shlex.quote(path)))
+            # editor could save file by replacing it, e.g. vim with
+            # backupcopy=no, so file is opened again after editing
+            with open(path) as edited:
+                if replied_msg := strip_replied_msg(edited.read().strip()):
                     self.model.view_all_msgs()
                     self.tg.reply_message(chat_id, reply_to_msg, replied_msg)
                     self.present_info("Message sent")
@@ -313,7 +402,7 @@ class Controller:
 
     @bind(msg_handler, ["a", "i"])
     def write_short_msg(self) -> None:
-        chat_id = self.model.chats.id_by_index(self.model.current_chat)
+        chat_id = self.model.current_chat_id
         if not self.can_send_msg() or chat_id is None:
             self.present_info("Can't send msg in this chat")
             return
@@ -327,17 +416,15 @@ class Controller:
 
     @bind(msg_handler, ["A", "I"])
     def write_long_msg(self) -> None:
-        chat_id = self.model.chats.id_by_index(self.model.current_chat)
+        chat_id = self.model.current_chat_id
         if not self.can_send_msg() or chat_id is None:
             self.present_info("Can't send msg in this chat")
             return
-        with NamedTemporaryFile("r+", suffix=".txt") as f, suspend(
-            self.view
-        ) as s:
+        with self.scratch_file() as path, suspend(self.view) as s:
             self.tg.send_chat_action(chat_id, ChatAction.chatActionTyping)
-            s.call(config.LONG_MSG_CMD.format(file_path=shlex.quote(f.name)))
-            with open(f.name) as f:
-                if msg := f.read().strip():
+            s.call(config.LONG_MSG_CMD.format(file_path=shlex.quote(path)))
+            with open(path) as edited:
+                if msg := edited.read().strip():
                     self.model.send_message(text=msg)
                     self.present_info("Message sent")
                 else:
@@ -357,15 +444,15 @@ class Controller:
     @bind(msg_handler, ["S"])
     def choose_and_send_file(self) -> None:
         """Call file picker and send chosen file based on mimetype"""
-        chat_id = self.model.chats.id_by_index(self.model.current_chat)
+        chat_id = self.model.current_chat_id
         file_path = None
         if not chat_id:
             return self.present_error("No chat selected")
         try:
-            with NamedTemporaryFile("w") as f, suspend(self.view) as s:
-                s.call(config.FILE_PICKER_CMD.format(file_path=f.name))
-                with open(f.name) as f:
-                    file_path = f.read().strip()
+            with self.scratch_file() as path, suspend(self.view) as s:
+                s.call(config.FILE_PICKER_CMD.format(file_path=path))
+                with open(path) as chosen:
+                    file_path = chosen.read().strip()
         except FileNotFoundError:
             pass
         if not file_path or not os.path.isfile(file_path):
@@ -416,15 +503,38 @@ class Controller:
         file_path = self.view.status.get_input()
         if not file_path or not os.path.isfile(file_path):
             return
-        chat_id = self.model.chats.id_by_index(self.model.current_chat)
+        chat_id = self.model.current_chat_id
         if not chat_id:
             return
         self._send_video(file_path, chat_id)
 
     def _send_video(self, file_path: str, chat_id: int) -> None:
-        width, height = get_video_resolution(file_path)
-        duration = get_duration(file_path)
-        self.tg.send_video(file_path, chat_id, width, height, duration)
+        # each probe spawns ffprobe, run them at the same time; they are
+        # submitted before sending, so it never waits for probes queued
+        # behind it in executor
+        resolution = executor.submit(get_video_resolution, file_path)
+        duration = executor.submit(get_duration, file_path)
+
+        def send() -> None:
+            width, height = resolution.result()
+            self.tg.send_video(
+                file_path, chat_id, width, height, duration.result()
+            )
+            self.present_info(f"Sent video: {file_path}")
+
+        self.run_in_background(send)
+
+    def run_in_background(self, fun: Callable[[], None]) -> None:
+        """run blocking work, so keys are handled while it's done"""
+
+        def run() -> None:
+            try:
+                fun()
+            except Exception as e:
+                log.exception("Error happened in background task")
+                self.present_error(str(e))
+
+        executor.submit(run)
 
     def send_file(
         self,
@@ -437,13 +547,15 @@ class Controller:
         if not file_path or not os.path.isfile(file_path):
             return self.present_info("Given path to file does not exist")
 
-        if chat_id := self.model.chats.id_by_index(self.model.current_chat):
+        if chat_id := self.model.current_chat_id:
             send_file_fun(file_path, chat_id)
             self.present_info("File sent")
 
     @bind(msg_handler, ["v"])
     def record_voice(self) -> None:
-        file_path = f"/tmp/voice-{datetime.now()}.oga"
+        # file must not exist yet, otherwise ffmpeg asks whether to overwrite
+        # it, so just pick unique name instead of creating temp file
+        file_path = os.path.join(gettempdir(), f"voice-{time.time_ns()}.oga")
         with suspend(self.view) as s:
             s.call(
                 config.VOICE_RECORD_CMD.format(
@@ -454,22 +566,28 @@ class Controller:
             f"Do you want to send recording: {file_path}? [Y/n]"
         )
         if resp is None or not is_yes(resp):
+            if os.path.isfile(file_path):
+                os.remove(file_path)
             return self.present_info("Voice message discarded")
 
         if not os.path.isfile(file_path):
             return self.present_info(f"Can't load recording file {file_path}")
 
-        chat_id = self.model.chats.id_by_index(self.model.current_chat)
+        chat_id = self.model.current_chat_id
         if not chat_id:
             return
-        duration = get_duration(file_path)
-        waveform = get_waveform(file_path)
-        self.tg.send_voice(file_path, chat_id, duration, waveform)
-        self.present_info(f"Sent voice msg: {file_path}")
+
+        def send() -> None:
+            duration = get_duration(file_path)
+            waveform = get_waveform(file_path)
+            self.tg.send_voice(file_path, chat_id, duration, waveform)
+            self.present_info(f"Sent voice msg: {file_path}")
+
+        self.run_in_background(send)
 
     @bind(msg_handler, ["D"])
     def download_current_file(self) -> None:
-        msg = MsgProxy(self.model.current_msg)
+        msg = self.model.current_msg_proxy
         log.debug("Downloading msg: %s", msg.msg)
         file_id = msg.file_id
         if not file_id:
@@ -490,18 +608,17 @@ class Controller:
 
     def _open_msg(self, msg: MsgProxy, cmd: str = None) -> None:
         if msg.is_text:
-            with NamedTemporaryFile("w", suffix=".txt") as f:
-                f.write(msg.text_content)
-                f.flush()
-                with suspend(self.view) as s:
-                    s.open_file(f.name, cmd)
+            with self.scratch_file(msg.text_content) as text_path, suspend(
+                self.view
+            ) as s:
+                s.open_file(text_path, cmd)
             return
 
         path = msg.local_path
         if not path:
             self.present_info("File should be downloaded first")
             return
-        chat_id = self.model.chats.id_by_index(self.model.current_chat)
+        chat_id = self.model.current_chat_id
         if not chat_id:
             return
         self.tg.open_message_content(chat_id, msg.msg_id)
@@ -511,7 +628,7 @@ class Controller:
     @bind(msg_handler, ["!"])
     def open_msg_with_cmd(self) -> None:
         """Open msg or file with cmd: less %s"""
-        msg = MsgProxy(self.model.current_msg)
+        msg = self.model.current_msg_proxy
         cmd = self.view.status.get_input()
         if not cmd:
             return
@@ -524,12 +641,12 @@ class Controller:
     @bind(msg_handler, ["l", "^J"])
     def open_current_msg(self) -> None:
         """Open msg or file with cmd in mailcap"""
-        msg = MsgProxy(self.model.current_msg)
+        msg = self.model.current_msg_proxy
         self._open_msg(msg)
 
     @bind(msg_handler, ["e"])
     def edit_msg(self) -> None:
-        msg = MsgProxy(self.model.current_msg)
+        msg = self.model.current_msg_proxy
         log.info("Editing msg: %s", msg.msg)
         if not self.model.is_me(msg.sender_id):
             return self.present_error("You can edit only your messages!")
@@ -538,14 +655,12 @@ class Controller:
         if not msg.can_be_edited:
             return self.present_error("Meessage can't be edited!")
 
-        with NamedTemporaryFile("r+", suffix=".txt") as f, suspend(
+        with self.scratch_file(msg.text_content) as path, suspend(
             self.view
         ) as s:
-            f.write(msg.text_content)
-            f.flush()
-            s.call(f"{config.EDITOR} {f.name}")
-            with open(f.name) as f:
-                if text := f.read().strip():
+            s.call(f"{config.EDITOR} {path}")
+            with open(path) as edited:
+                if text := edited.read().strip():
                     self.model.edit_message(text=text)
                     self.present_info("Message edited")
 
@@ -554,19 +669,19 @@ class Controller:
         _, cols = self.view.stdscr.getmaxyx()
         limit = min(
             int(cols / 2),
-            max(len(user.name) for user in users),
+            max((len(user.name) for user in users), default=0),
         )
         users_out = "\n".join(
             f"{user.id}\t{user.name:<{limit}} | {user.status}"
-            for user in sorted(users, key=lambda user: user.order)
+            for user in sorted(users, key=attrgetter("order"))
         )
         cmd = config.FZF + " -n 2"
         if is_multiple:
             cmd += " -m"
 
-        with NamedTemporaryFile("r+") as tmp, suspend(self.view) as s:
-            s.run_with_input(f"{cmd} > {tmp.name}", users_out)
-            with open(tmp.name) as f:
+        with self.scratch_file() as path, suspend(self.view) as s:
+            s.run_with_input(f"{cmd} > {path}", users_out)
+            with open(path) as f:
                 return [int(line.split()[0]) for line in f.readlines()]
 
     @bind(chat_handler, ["ns"])
@@ -664,7 +779,7 @@ class Controller:
             return self.present_info("Chat not found")
 
         chat_id = chat_ids[0]
-        if chat_id not in self.model.chats.chat_ids:
+        if chat_id not in self.model.chats.chats_by_id:
             self.present_info("Chat not loaded")
             return
 
@@ -678,9 +793,9 @@ class Controller:
         self._get_user_ids()
 
     @bind(chat_handler, ["l", "^J", "^E"])
-    def handle_msgs(self) -> Optional[str]:
+    def handle_msgs(self) -> Optional[int]:
         rc = self.handle(msg_handler, 0.2)
-        if rc == "QUIT":
+        if rc == QUIT:
             return rc
         self.chat_size = 0.5
         self.resize()
@@ -716,7 +831,7 @@ class Controller:
         chat_id = chat["id"]
         toggle = not chat["is_marked_as_unread"]
         self.tg.toggle_chat_is_marked_as_unread(chat_id, toggle)
-        self.render()
+        self.render_chats()
 
     @bind(chat_handler, ["r"])
     def read_msgs(self) -> None:
@@ -739,7 +854,7 @@ class Controller:
         else:
             notification_settings["mute_for"] = 2147483647
         self.tg.set_chat_nottification_settings(chat_id, notification_settings)
-        self.render()
+        self.render_chats()
 
     @bind(chat_handler, ["p"])
     def toggle_pin(self) -> None:
@@ -747,43 +862,81 @@ class Controller:
         chat_id = chat["id"]
         toggle = not chat["is_pinned"]
         self.tg.toggle_chat_is_pinned(chat_id, toggle)
-        self.render()
+        self.render_chats()
 
     def run(self) -> None:
         try:
             self.handle(chat_handler, 0.5)
-            self.queue.put(self.close)
         except Exception:
             log.exception("Error happened in main loop")
+        finally:
+            # stop draw loop in the main thread, otherwise tg would hang
+            # without anything handling keys
+            self.queue.put(self.close)
 
     def close(self) -> None:
         self.is_running = False
+        try:
+            os.unlink(self._scratch_path)
+        except FileNotFoundError:
+            pass
 
-    def handle(self, handlers: Dict[str, HandlerType], size: float) -> str:
+    def handle(self, handlers: Dict[str, HandlerType], size: float) -> int:
         self.chat_size = size
         self.resize()
+        prefixes = get_prefixes(handlers)
 
         while True:
             try:
-                repeat_factor, keys = self.view.get_keys()
-                fun = handlers.get(keys, lambda *_: None)
+                repeat_factor, keys = self.view.get_keys(prefixes)
+                fun = handlers.get(keys, noop)
+                if fun in repeat_handlers:
+                    # when key is held down, move once by number of
+                    # repeated key presses instead of drawing each move
+                    repeat_factor += self.view.count_repeated_keys(keys)
                 res = fun(self, repeat_factor)  # type: ignore
-                if res == "QUIT":
-                    return res
-                elif res == "BACK":
+                # handler could suspend view, e.g. to open editor, render
+                # updates that were skipped meanwhile
+                if self._render_after_resume:
+                    self._render_after_resume = False
+                    self.render()
+                if res == QUIT or res == BACK:
                     return res
             except Exception:
                 log.exception("Error happend in key handle loop")
 
     def resize_handler(self, signum: int, frame: Any) -> None:
+        # dragging terminal window sends a lot of SIGWINCH signals, wait
+        # until size settles instead of resizing for intermediate sizes
+        if self._resize_timer is not None:
+            self._resize_timer.cancel()
+        self._resize_timer = threading.Timer(
+            RESIZE_DEBOUNCE, self.queue.put, args=(self._resize_terminal,)
+        )
+        self._resize_timer.daemon = True
+        self._resize_timer.start()
+
+    def _resize_terminal(self) -> None:
         self.view.resize_handler()
+        # SIGWINCH can be sent without changing size, e.g. by tiling window
+        # managers, screen is already restored by resize handler then
+        if self.view.stdscr.getmaxyx() == self._size:
+            return
         self.resize()
 
     def resize(self) -> None:
+        # resize and redraw only once for all requests received until it's
+        # handled
+        if self._resize_pending:
+            return
+        self._resize_pending = True
         self.queue.put(self._resize)
 
     def _resize(self) -> None:
-        rows, cols = self.view.stdscr.getmaxyx()
+        self._resize_pending = False
+        self._render_chats_pending = False
+        self._render_msgs_pending = False
+        rows, cols = self._size = self.view.stdscr.getmaxyx()
         # If we didn't clear the screen before doing this,
         # the original window contents would remain on the screen
         # and we would see the window text twice.
@@ -798,13 +951,21 @@ class Controller:
         self._render()
 
     def draw(self) -> None:
+        last_draw = 0.0
         while self.is_running:
-            try:
-                log.info("Queue size: %d", self.queue.qsize())
-                fun = self.queue.get()
-                fun()
-            except Exception:
-                log.exception("Error happened in draw loop")
+            funs = [self.queue.get()]
+            if (delay := last_draw + 1 / MAX_FPS - time.monotonic()) > 0:
+                time.sleep(delay)
+            # take everything queued meanwhile, so the same draw queued
+            # several times is done only once
+            while not self.queue.empty():
+                funs.append(self.queue.get_nowait())
+            for fun in dict.fromkeys(funs):
+                try:
+                    fun()
+                except Exception:
+                    log.exception("Error happened in draw loop")
+            last_draw = time.monotonic()
 
     def present_error(self, msg: str) -> None:
         return self.update_status("Error", msg)
@@ -813,25 +974,54 @@ class Controller:
         return self.update_status("Info", msg)
 
     def update_status(self, level: str, msg: str) -> None:
-        self.queue.put(partial(self._update_status, level, msg))
-
-    def _update_status(self, level: str, msg: str) -> None:
+        with self._status_lock:
+            is_pending = self._status is not None
+            self._status = level, msg
+        if not is_pending:
+            self.queue.put(self._update_status)
+
+    def _update_status(self) -> None:
+        with self._status_lock:
+            status, self._status = self._status, None
+        if status is None:
+            return
+        level, msg = status
         self.view.status.draw(f"{level}: {msg}")
 
     def render(self) -> None:
+        # full render redraws both chats and msgs, so mark both as pending,
+        # it makes partial renders requested before it is handled no-op
+        if self._render_chats_pending and self._render_msgs_pending:
+            return
+        self._render_chats_pending = self._render_msgs_pending = True
         self.queue.put(self._render)
 
     def _render(self) -> None:
-        self._render_chats()
-        self._render_msgs()
+        # msgs are rendered even if chats failed, otherwise pending flag of
+        # msgs would stay set and following msgs renders would be skipped
+        try:
+            self._render_chats()
+        finally:
+            self._render_msgs()
 
     def render_status(self) -> None:
         self.view.status.draw()
 
     def render_chats(self) -> None:
+        # tdlib sends updates in bursts, e.g. when a lot of msgs arrive at
+        # once, so skip enqueueing if there is a render not yet handled
+        if self._render_chats_pending:
+            return
+        self._render_chats_pending = True
         self.queue.put(self._render_chats)
 
     def _render_chats(self) -> None:
+        # reset before reading model, so updates that happen during render
+        # enqueue another one
+        self._render_chats_pending = False
+        if self.view.is_suspended:
+            self._render_after_resume = True
+            return
         page_size = self.view.chats.h - 1
         chats = self.model.get_chats(
             self.model.current_chat, page_size, MSGS_LEFT_SCROLL_THRESHOLD
@@ -842,9 +1032,16 @@ class Controller:
         self.view.chats.draw(selected_chat, chats, self.model.chats.title)
 
     def render_msgs(self) -> None:
+        if self._render_msgs_pending:
+            return
+        self._render_msgs_pending = True
         self.queue.put(self._render_msgs)
 
     def _render_msgs(self) -> None:
+        self._render_msgs_pending = False
+        if self.view.is_suspended:
+            self._render_after_resume = True
+            return
         current_msg_idx = self.model.get_current_chat_msg_idx()
         if current_msg_idx is None:
             return
@@ -859,12 +1056,23 @@ class Controller:
         )
 
     def notify_for_message(self, chat_id: int, msg: MsgProxy) -> None:
+        try:
+            self._notify_queue.put_nowait((chat_id, msg))
+        except Full:
+            log.warning("Notifications queue is full, skipping msg")
+
+    def _notify_loop(self) -> None:
+        while True:
+            chat_id, msg = self._notify_queue.get()
+            try:
+                self._notify_for_message(chat_id, msg)
+            except Exception:
+                log.exception("Error happened in notify loop")
+
+    def _notify_for_message(self, chat_id: int, msg: MsgProxy) -> None:
         # do not notify, if muted
-        # TODO: optimize
-        for chat in self.model.chats.chats:
-            if chat_id == chat["id"]:
-                break
-        else:
+        chat = self.model.chats.chats_by_id.get(chat_id)
+        if chat is None:
             # chat not found, do not notify
             return
 
@@ -875,22 +1083,57 @@ class Controller:
         # notify
         if self.model.is_me(msg["sender_id"].get("user_id")):
             return
-        user = self.model.users.get_user(msg.sender_id)
-        name = f"{user['first_name']} {user['last_name']}"
+        name = self.model.users.get_user_label(msg.sender_id)
 
-        if text := msg.text_content if msg.is_text else msg.content_type:
+        text = msg.text_content if msg.is_text else msg.content_type
+        if not text:
+            return
+        with self._notify_lock:
+            if pending := self._pending_notifications.get(chat_id):
+                # timer is already started, just add msg to notification
+                count = pending[3] + 1
+                self._pending_notifications[chat_id] = (
+                    chat["title"],
+                    name,
+                    text,
+                    count,
+                )
+                return
+            now = time.monotonic()
+            last = self._last_notify_time.get(chat_id)
+            if last is not None and now - last < NOTIFY_BURST_INTERVAL:
+                self._pending_notifications[chat_id] = (
+                    chat["title"],
+                    name,
+                    text,
+                    1,
+                )
+                timer = threading.Timer(
+                    last + NOTIFY_BURST_INTERVAL - now,
+                    self._send_pending_notification,
+                    args=(chat_id,),
+                )
+                timer.daemon = True
+                timer.start()
+                return
+            self._last_notify_time[chat_id] = now
+        notify(text, title=name)
+
+    def _send_pending_notification(self, chat_id: int) -> None:
+        with self._notify_lock:
+            title, name, text, count = self._pending_notifications.pop(chat_id)
+            self._last_notify_time[chat_id] = time.monotonic()
+        if count == 1:
             notify(text, title=name)
+        else:
+            notify(f"{count} new messages", title=title)
 
     def refresh_current_chat(self, current_chat_id: Optional[int]) -> None:
         if current_chat_id is None:
             return
-        # TODO: we can create <index> for chats, it's faster than sqlite anyway
-        # though need to make sure that creatinng index is atomic operation
-        # requires locks for read, until index and chats will be the same
-        for i, chat in enumerate(self.model.chats.chats):
-            if chat["id"] == current_chat_id:
-                self.model.current_chat = i
-                break
+        index = self.model.chats.index_by_id(current_chat_id)
+        if index is not None:
+            self.model.current_chat = index
         self.render()
 
 
@@ -898,8 +1141,10 @@ def insert_replied_msg(msg: MsgProxy) -> str:
     text = msg.text_content if msg.is_text else msg.content_type
     if not text:
         return ""
+    prefix = f"{REPLY_MSG_PREFIX} "
     return (
-        "\n".join([f"{REPLY_MSG_PREFIX} {line}" for line in text.split("\n")])
+        prefix
+        + text.replace("\n", f"\n{prefix}")
         # adding line with whitespace so text editor could start editing from last line
         + "\n "
     )
@@ -907,9 +1152,7 @@ def insert_replied_msg(msg: MsgProxy) -> str:
 
 def strip_replied_msg(msg: str) -> str:
     return "\n".join(
-        [
-            line
-            for line in msg.split("\n")
-            if not line.startswith(REPLY_MSG_PREFIX)
-        ]
+        line
+        for line in msg.split("\n")
+        if not line.startswith(REPLY_MSG_PREFIX)
     )
@@ -6,17 +6,20 @@ import time
 from collections import defaultdict, namedtuple
 from typing import Any, Dict, List, Optional, Set, Tuple
 
+from telegram.utils import AsyncResult
+
 from tg.msg import MsgProxy
 from tg.tdlib import (
     ChatAction,
     ChatType,
+    ResultsWorker,
     SecretChatState,
     Tdlib,
     UserStatus,
     UserType,
     get_chat_type,
 )
-from tg.utils import copy_to_clipboard, pretty_ts
+from tg.utils import bisect_desc, copy_to_clipboard, pretty_ts
 
 log = logging.getLogger(__name__)
 
@@ -25,12 +28,13 @@ class Model:
     def __init__(self, tg: Tdlib) -> None:
         self.tg = tg
         self.chats = ChatModel(tg)
-        self.msgs = MsgModel(tg)
+        self.msgs = MsgModel(tg, ResultsWorker())
         self.users = UserModel(tg)
         self.current_chat = 0
         self.downloads: Dict[int, Tuple[int, int]] = {}
-        self.selected: Dict[int, List[int]] = defaultdict(list)
+        self.selected: Dict[int, Set[int]] = defaultdict(set)
         self.copied_msgs: Tuple[int, List[int]] = (0, [])
+        self._current_msg_proxy: Optional[MsgProxy] = None
 
     def get_me(self) -> Dict[str, Any]:
         return self.users.get_me()
@@ -43,7 +47,7 @@ class Model:
         return self.chats.id_by_index(self.current_chat)
 
     def get_current_chat_msg_idx(self) -> Optional[int]:
-        chat_id = self.chats.id_by_index(self.current_chat)
+        chat_id = self.current_chat_id
         if chat_id is None:
             return None
         return self.msgs.current_msgs[chat_id]
@@ -54,7 +58,7 @@ class Model:
         page_size: int = 10,
         msgs_left_scroll_threshold: int = 10,
     ) -> List[Tuple[int, Dict[str, Any]]]:
-        chat_id = self.chats.id_by_index(self.current_chat)
+        chat_id = self.current_chat_id
         if chat_id is None:
             return []
         msgs_left = page_size - 1 - current_position
@@ -65,47 +69,52 @@ class Model:
 
     @property
     def current_msg(self) -> Dict[str, Any]:
-        chat_id = self.chats.id_by_index(self.current_chat)
+        chat_id = self.current_chat_id
         if chat_id is None:
             return {}
         current_msg = self.msgs.current_msgs[chat_id]
-        log.info("current-msg: %s", current_msg)
         msg_id = self.msgs.msg_ids[chat_id][current_msg]
         return self.msgs.msgs[chat_id][msg_id]
 
+    @property
+    def current_msg_proxy(self) -> MsgProxy:
+        msg = self.current_msg
+        # reuse proxy while the same msg is selected, it is checked by
+        # identity so proxy is recreated when msg dict is replaced
+        proxy = self._current_msg_proxy
+        if proxy is None or proxy.msg is not msg:
+            proxy = self._current_msg_proxy = MsgProxy(msg)
+        return proxy
+
     @property
     def current_msg_id(self) -> int:
         return self.current_msg["id"]
 
     def jump_bottom(self) -> bool:
         res = False
-        if chat_id := self.chats.id_by_index(self.current_chat):
+        if chat_id := self.current_chat_id:
             res = self.msgs.jump_bottom(chat_id)
         self.view_current_msg()
         return res
 
     def set_current_chat_by_id(self, chat_id: int) -> bool:
-        idx = next(
-            iter(
-                i
-                for i, chat in enumerate(self.chats.chats)
-                if chat["id"] == chat_id
-            )
-        )
+        idx = self.chats.index_by_id(chat_id)
+        if idx is None:
+            return False
         return self.set_current_chat(idx)
 
     def set_current_chat(self, chat_idx: int) -> bool:
-        if 0 < chat_idx < len(self.chats.chats):
+        if 0 <= chat_idx < len(self.chats.chats):
             self.current_chat = chat_idx
             return True
         return False
 
     def next_chat(self, step: int = 1) -> bool:
-        new_idx = self.current_chat + step
-        if new_idx < len(self.chats.chats):
-            self.current_chat = new_idx
-            return True
-        return False
+        last_idx = len(self.chats.chats) - 1
+        if self.current_chat >= last_idx:
+            return False
+        self.current_chat = min(last_idx, self.current_chat + step)
+        return True
 
     def prev_chat(self, step: int = 1) -> bool:
         if self.current_chat == 0:
@@ -120,9 +129,8 @@ class Model:
         return False
 
     def view_current_msg(self) -> None:
-        msg = MsgProxy(self.current_msg)
-        msg_id = msg["id"]
-        if chat_id := self.chats.id_by_index(self.current_chat):
+        msg_id = self.current_msg_id
+        if chat_id := self.current_chat_id:
             self.tg.view_messages(chat_id, [msg_id])
 
     def view_all_msgs(self) -> None:
@@ -132,7 +140,7 @@ class Model:
         self.tg.view_messages(chat_id, [msg_id])
 
     def next_msg(self, step: int = 1) -> bool:
-        chat_id = self.chats.id_by_index(self.current_chat)
+        chat_id = self.current_chat_id
         if not chat_id:
             return False
         is_next = self.msgs.next_msg(chat_id, step)
@@ -140,7 +148,7 @@ class Model:
         return is_next
 
     def prev_msg(self, step: int = 1) -> bool:
-        chat_id = self.chats.id_by_index(self.current_chat)
+        chat_id = self.current_chat_id
         if not chat_id:
             return False
         is_prev = self.msgs.prev_msg(chat_id, step)
@@ -160,7 +168,7 @@ class Model:
         return self.chats.fetch_chats(offset=offset, limit=limit)
 
     def send_message(self, text: str) -> bool:
-        chat_id = self.chats.id_by_index(self.current_chat)
+        chat_id = self.current_chat_id
         if chat_id is None:
             return False
         # order is matter: this should be before send_message
@@ -170,8 +178,9 @@ class Model:
         return True
 
     def edit_message(self, text: str) -> bool:
-        if chat_id := self.chats.id_by_index(self.current_chat):
-            return self.msgs.edit_message(chat_id, self.current_msg_id, text)
+        if chat_id := self.current_chat_id:
+            self.msgs.edit_message(chat_id, self.current_msg_id, text)
+            return True
         return False
 
     def can_be_deleted(self, chat_id: int, msg: Dict[str, Any]) -> bool:
@@ -183,12 +192,12 @@ class Model:
         return msg["can_be_deleted_for_all_users"]
 
     def delete_msgs(self) -> bool:
-        chat_id = self.chats.id_by_index(self.current_chat)
+        chat_id = self.current_chat_id
         if not chat_id:
             return False
         msg_ids = self.selected[chat_id]
         if msg_ids:
-            message_ids = msg_ids
+            message_ids = sorted(msg_ids)
             for msg_id in message_ids:
                 msg = self.msgs.get_message(chat_id, msg_id)
                 if not msg or not self.can_be_deleted(chat_id, msg):
@@ -206,7 +215,7 @@ class Model:
         return True
 
     def forward_msgs(self) -> bool:
-        chat_id = self.chats.id_by_index(self.current_chat)
+        chat_id = self.current_chat_id
         if not chat_id:
             return False
         from_chat_id, msg_ids = self.copied_msgs
@@ -369,7 +378,9 @@ class ChatModel:
         self.tg = tg
         self.chats: List[Dict[str, Any]] = []
         self.inactive_chats: Dict[int, Dict[str, Any]] = {}
-        self.chat_ids: Set[int] = set()
+        self.chats_by_id: Dict[int, Dict[str, Any]] = {}
+        # chat id -> index in chats, rebuilt on every change of chats order
+        self.idx_by_id: Dict[int, int] = {}
         self.have_full_chat_list = False
         self.title: str = "Chats"
         self.found_chats: List[int] = []
@@ -388,10 +399,25 @@ class ChatModel:
             return None
         return self.chats[index]["id"]
 
+    def index_by_id(self, chat_id: int) -> Optional[int]:
+        chats = self.chats
+        index = self.idx_by_id.get(chat_id)
+        if index is not None and index < len(chats):
+            if chats[index]["id"] == chat_id:
+                return index
+        # chats could be reordered by tdlib updates in another thread while
+        # index is rebuilt, fallback to search in chats then
+        for i, chat in enumerate(chats):
+            if chat["id"] == chat_id:
+                return i
+        return None
+
     def fetch_chats(
         self, offset: int = 0, limit: int = 10
     ) -> List[Dict[str, Any]]:
-        if offset + limit > len(self.chats):
+        # limit is index of the last chat on the page, so request next chats
+        # from tdlib only when the page is not fully loaded yet
+        if limit > len(self.chats):
             self._load_next_chats()
 
         return self.chats[offset:limit]
@@ -422,22 +448,23 @@ class ChatModel:
             self.have_full_chat_list = True
             return
 
-        for chat_id in chat_ids:
-            chat = self.fetch_chat(chat_id)
-            self.add_chat(chat)
-
-    def fetch_chat(self, chat_id: int) -> Dict[str, Any]:
-        result = self.tg.get_chat(chat_id)
-        result.wait()
-
-        if result.error:
-            log.error(f"get chat error: {result.error_info}")
-            return {}
-        return result.update
+        # send all requests first and only then wait for them, so tdlib
+        # could process them concurrently instead of one by one
+        results = [
+            self.tg.get_chat(chat_id)
+            for chat_id in chat_ids
+            if chat_id not in self.chats_by_id
+        ]
+        for result in results:
+            result.wait()
+            if result.error:
+                log.error(f"get chat error: {result.error_info}")
+                continue
+            self.add_chat(result.update)
 
     def add_chat(self, chat: Dict[str, Any]) -> None:
         chat_id = chat["id"]
-        if chat_id in self.chat_ids:
+        if chat_id in self.chats_by_id:
             return
 
         if len(chat["positions"]) > 0:
@@ -448,7 +475,7 @@ class ChatModel:
         if int(chat["order"]) == 0:
             self.inactive_chats[chat_id] = chat
             return
-        self.chat_ids.add(chat_id)
+        self.chats_by_id[chat_id] = chat
         self.chats.append(chat)
         self._sort_chats()
 
@@ -460,18 +487,21 @@ class ChatModel:
             key=lambda it: (it["order"], it["id"]),
             reverse=True,
         )
+        self._index_chats()
+
+    def _index_chats(self) -> None:
+        self.idx_by_id = {chat["id"]: i for i, chat in enumerate(self.chats)}
 
     def update_chat(self, chat_id: int, **updates: Dict[str, Any]) -> bool:
-        for i, chat in enumerate(self.chats):
-            if chat["id"] != chat_id:
-                continue
+        if chat := self.chats_by_id.get(chat_id):
             chat.update(updates)
             if int(chat["order"]) == 0:
                 self.inactive_chats[chat_id] = chat
-                self.chat_ids.discard(chat_id)
+                del self.chats_by_id[chat_id]
                 self.chats = [
                     _chat for _chat in self.chats if _chat["id"] != chat_id
                 ]
+                self._index_chats()
                 log.info(f"Removing chat '{chat['title']}'")
             else:
                 self._sort_chats()
@@ -492,18 +522,29 @@ class ChatModel:
 
 
 class MsgModel:
-    def __init__(self, tg: Tdlib) -> None:
+    def __init__(self, tg: Tdlib, results: ResultsWorker) -> None:
         self.tg = tg
+        self.results = results
         self.msgs: Dict[int, Dict[int, Dict]] = defaultdict(dict)
         self.current_msgs: Dict[int, int] = defaultdict(int)
         self.not_found: Set[int] = set()
         self.msg_ids: Dict[int, List[int]] = defaultdict(list)
 
+    def _msg_idx(self, chat_id: int, msg_id: int) -> Optional[int]:
+        # msg_ids are sorted from newest to oldest, so binary search is
+        # enough instead of scanning the whole list
+        ids = self.msg_ids[chat_id]
+        idx = bisect_desc(ids, msg_id)
+        if idx < len(ids) and ids[idx] == msg_id:
+            return idx
+        return None
+
     def jump_to_msg_by_id(self, chat_id: int, msg_id: int) -> bool:
-        if index := self.msg_ids[chat_id].index(msg_id):
-            self.current_msgs[chat_id] = index
-            return True
-        return False
+        index = self._msg_idx(chat_id, msg_id)
+        if index is None:
+            return False
+        self.current_msgs[chat_id] = index
+        return True
 
     def next_msg(self, chat_id: int, step: int = 1) -> bool:
         current_msg = self.current_msgs[chat_id]
@@ -519,11 +560,12 @@ class MsgModel:
         return True
 
     def prev_msg(self, chat_id: int, step: int = 1) -> bool:
-        new_idx = self.current_msgs[chat_id] + step
-        if new_idx < len(self.msg_ids[chat_id]):
-            self.current_msgs[chat_id] = new_idx
-            return True
-        return False
+        last_idx = len(self.msg_ids[chat_id]) - 1
+        current_msg = self.current_msgs[chat_id]
+        if current_msg >= last_idx:
+            return False
+        self.current_msgs[chat_id] = min(last_idx, current_msg + step)
+        return True
 
     def get_message(self, chat_id: int, msg_id: int) -> Optional[Dict]:
         if msg_id in self.not_found:
@@ -540,20 +582,22 @@ class MsgModel:
     def remove_messages(self, chat_id: int, msg_ids: List[int]) -> None:
         log.info(f"removing msg {msg_ids=}")
         for msg_id in msg_ids:
-            try:
-                self.msg_ids[chat_id].remove(msg_id)
-            except ValueError:
-                pass
+            index = self._msg_idx(chat_id, msg_id)
+            if index is not None:
+                del self.msg_ids[chat_id][index]
             self.msgs[chat_id].pop(msg_id, None)
 
     def add_message(self, chat_id: int, msg: Dict[str, Any]) -> None:
         log.info(f"adding {msg=}")
         msg_id = msg["id"]
-        ids = self.msg_ids[chat_id]
-        self.msgs[chat_id][msg_id] = msg
-        ids.insert(0, msg_id)
-        if len(ids) >= 2 and msg_id < ids[1]:
-            self.msg_ids[chat_id].sort(reverse=True)
+        msgs = self.msgs[chat_id]
+        is_new = msg_id not in msgs
+        msgs[msg_id] = msg
+        if is_new:
+            # msg_ids are kept sorted from newest to oldest, so find place
+            # for the msg instead of sorting all ids on every insert
+            ids = self.msg_ids[chat_id]
+            ids.insert(bisect_desc(ids, msg_id), msg_id)
 
     def update_msg_content_opened(self, chat_id: int, msg_id: int) -> None:
         msg = self.msgs[chat_id].get(msg_id)
@@ -592,16 +636,20 @@ class MsgModel:
                 limit=len(self.msg_ids[chat_id]) + limit,
             )
         result.wait()
-        if not result or not result.update["messages"]:
+        if result.error or not result.update["messages"]:
             return []
 
         messages = result.update["messages"]
 
         # tdlib could doesn't guarantee number of messages, so we need to
-        # send another request on demand
+        # send up to 3 more requests on demand, stopping early when there are
+        # no more messages
         # see https://github.com/tdlib/td/issues/168
-        for i in range(3):
-            if len(messages) >= limit + offset:
+        # limit already includes offset (see fetch_msgs) and counts cached
+        # msgs, so only the rest of them are needed
+        needed = limit - len(self.msg_ids[chat_id])
+        for _ in range(3):
+            if len(messages) >= needed:
                 break
             result = self.tg.get_chat_history(
                 chat_id,
@@ -609,6 +657,8 @@ class MsgModel:
                 limit=len(self.msg_ids[chat_id]) + limit,
             )
             result.wait()
+            if result.error or not result.update["messages"]:
+                break
             messages += result.update["messages"]
 
         return messages
@@ -630,21 +680,19 @@ class MsgModel:
             )
         ]
 
-    def edit_message(self, chat_id: int, message_id: int, text: str) -> bool:
+    def edit_message(self, chat_id: int, message_id: int, text: str) -> None:
         log.info("Editing msg")
         result = self.tg.edit_message_text(chat_id, message_id, text)
-
-        result.wait()
-        if result.error:
-            log.info(f"send message error: {result.error_info}")
-            return False
-        else:
-            log.info(f"message has been sent: {result.update}")
-            return True
+        self.results.submit(result, self._log_send_result)
 
     def send_message(self, chat_id: int, text: str) -> None:
+        # tdlib adds pending msg with updateNewMessage right away, so there
+        # is no need to block until server confirms that msg has been sent
         result = self.tg.send_message(chat_id, text)
-        result.wait()
+        self.results.submit(result, self._log_send_result)
+
+    @staticmethod
+    def _log_send_result(result: AsyncResult) -> None:
         if result.error:
             log.info(f"send message error: {result.error_info}")
         else:
@@ -672,6 +720,9 @@ class UserModel:
         self.actions: Dict[int, Dict] = {}
         self.not_found: Set[int] = set()
         self.contacts: Dict[str, Any] = {}
+        # user id -> label, users are requested once and their names are
+        # not updated after that, so labels are formatted only once
+        self.labels: Dict[int, str] = {}
 
     def get_me(self) -> Dict[str, Any]:
         if self.me:
@@ -827,6 +878,11 @@ class UserModel:
     def get_user_label(self, user_id: int) -> str:
         if user_id == 0:
             return ""
+        if (label := self.labels.get(user_id)) is None:
+            label = self.labels[user_id] = self._format_label(user_id)
+        return label
+
+    def _format_label(self, user_id: int) -> str:
         user = self.get_user(user_id)
         if user.get("first_name") and user.get("last_name"):
             return f'{user["first_name"]} {user["last_name"]}'[:20]
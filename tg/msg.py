@@ -166,6 +166,21 @@ class MsgProxy:
     def text_content(self) -> str:
         return self.msg["content"]["text"]["text"]
 
+    @property
+    def urls(self) -> List[str]:
+        if not self.is_text:
+            return []
+        text = self.msg["content"]["text"]
+        urls = []
+        for entity in text["entities"]:
+            _type = entity["type"]["@type"]
+            if _type == "textEntityTypeUrl":
+                offset = entity["offset"]
+                urls.append(text["text"][offset : offset + entity["length"]])
+            elif _type == "textEntityTypeTextUrl":
+                urls.append(entity["type"]["url"])
+        return urls
+
     @property
     def is_downloaded(self) -> bool:
         doc = self.get_doc(self.msg)
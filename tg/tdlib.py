@@ -1,8 +1,13 @@
+import logging
+import threading
 from enum import Enum
-from typing import Any, Dict, List, Optional, Union
+from queue import Queue
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from telegram.client import AsyncResult, Telegram
 
+log = logging.getLogger(__name__)
+
 
 class ChatAction(Enum):
     chatActionTyping = "typing"
@@ -427,6 +432,33 @@ class Tdlib(Telegram):
         return self._send_data(data)
 
 
+class ResultsWorker:
+    """
+    Waits for results of tdlib requests in the background thread, so caller
+    does not block on requests which result is not needed right away
+    """
+
+    def __init__(self) -> None:
+        self.queue: Queue = Queue()
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def submit(
+        self, result: AsyncResult, callback: Callable[[AsyncResult], None]
+    ) -> None:
+        self.queue.put((result, callback))
+
+    def _run(self) -> None:
+        while True:
+            result, callback = self.queue.get()
+            try:
+                result.wait()
+                callback(result)
+            except Exception:
+                log.exception("Error happened in results worker")
+
+
 def get_chat_type(chat: Dict[str, Any]) -> Optional[ChatType]:
     try:
         chat_type = ChatType[chat["type"]["@type"]]
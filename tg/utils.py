@@ -2,9 +2,7 @@ import base64
 import curses
 import hashlib
 import logging
-import mailcap
 import math
-import mimetypes
 import os
 import random
 import shlex
@@ -17,12 +15,30 @@ from functools import lru_cache
 from logging.handlers import RotatingFileHandler
 from subprocess import CompletedProcess
 from types import TracebackType
-from typing import Any, Dict, Optional, Tuple, Type
+from typing import Any, Dict, List, Optional, Tuple, Type
 
 from tg import config
 
 log = logging.getLogger(__name__)
 units = {"B": 1, "KB": 10 ** 3, "MB": 10 ** 6, "GB": 10 ** 9, "TB": 10 ** 12}
+# mime types of files that are sent and opened most often, so mimetypes
+# database doesn't have to be loaded for them
+common_mime_types = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".mp4": "video/mp4",
+    ".webm": "video/webm",
+    ".mov": "video/quicktime",
+    ".mp3": "audio/mpeg",
+    ".ogg": "audio/ogg",
+    ".oga": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".pdf": "application/pdf",
+    ".txt": "text/plain",
+}
 
 
 class LogWriter:
@@ -63,8 +79,21 @@ def setup_log() -> None:
     logging.captureWarnings(True)
 
 
-def get_mime(file_path: str) -> str:
+def guess_mime_type(file_path: str) -> Optional[str]:
+    _, ext = os.path.splitext(file_path)
+    if mtype := common_mime_types.get(ext.lower()):
+        return mtype
+
+    # mimetypes and mailcap are imported on demand, they are needed only when
+    # files are sent or opened and loading them reads system files
+    import mimetypes
+
     mtype, _ = mimetypes.guess_type(file_path)
+    return mtype
+
+
+def get_mime(file_path: str) -> str:
+    mtype = guess_mime_type(file_path)
     if not mtype:
         return ""
     if mtype == "image/gif":
@@ -74,13 +103,27 @@ def get_mime(file_path: str) -> str:
 
 def get_mailcap() -> Dict:
     if config.MAILCAP_FILE:
-        with open(config.MAILCAP_FILE) as f:
+        # mailcap file could be edited while tg is running, so parse it
+        # again only when it has been changed
+        st = os.stat(config.MAILCAP_FILE)
+        return _load_mailcap(config.MAILCAP_FILE, st.st_mtime_ns, st.st_size)
+    return _load_mailcap(None, 0, 0)
+
+
+@lru_cache(maxsize=1)
+def _load_mailcap(path: Optional[str], mtime_ns: int, size: int) -> Dict:
+    import mailcap
+
+    if path:
+        with open(path) as f:
             return mailcap.readmailcapfile(f)  # type: ignore
     return mailcap.getcaps()
 
 
 def get_file_handler(file_path: str) -> str:
-    mtype, _ = mimetypes.guess_type(file_path)
+    import mailcap
+
+    mtype = guess_mime_type(file_path)
     if not mtype:
         return config.DEFAULT_OPEN.format(file_path=shlex.quote(file_path))
 
@@ -190,23 +233,34 @@ def notify(
 
 def string_len_dwc(string: str) -> int:
     """Returns string len including count for double width characters"""
+    if string.isascii():
+        # there are no double width characters in ascii
+        return len(string)
     return sum(1 + (unicodedata.east_asian_width(c) in "WF") for c in string)
 
 
 def truncate_to_len(string: str, width: int) -> str:
-    real_len = string_len_dwc(string)
-    if real_len <= width:
-        return string
+    if string.isascii():
+        return string[: max(width, 1)]
 
     cur_len = 0
-    out_string = ""
-
-    for char in string:
+    for i, char in enumerate(string):
         cur_len += 2 if unicodedata.east_asian_width(char) in "WF" else 1
-        out_string += char
         if cur_len >= width:
-            break
-    return out_string
+            return string[: i + 1]
+    return string
+
+
+def bisect_desc(items: List[int], item: int) -> int:
+    """Returns insertion index of item in list sorted in descending order"""
+    lo, hi = 0, len(items)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if items[mid] > item:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
 
 
 def copy_to_clipboard(text: str) -> None:
@@ -244,6 +298,7 @@ class suspend:
         for view in (self.view.chats, self.view.msgs, self.view.status):
             view._refresh = view.win.noutrefresh
         self.view.resize_handler = self.view.resize_stub
+        self.view.is_suspended = True
         curses.echo()
         curses.nocbreak()
         self.view.stdscr.keypad(False)
@@ -260,6 +315,7 @@ class suspend:
         for view in (self.view.chats, self.view.msgs, self.view.status):
             view._refresh = view.win.refresh
         self.view.resize_handler = self.view.resize
+        self.view.is_suspended = False
         curses.noecho()
         curses.cbreak()
         self.view.stdscr.keypad(True)
@@ -1,7 +1,8 @@
 import curses
 import logging
-from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple, Union, cast
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Union, cast
 
 from _curses import window  # type: ignore
 
@@ -15,17 +16,8 @@ from tg.utils import get_color_by_str, num, string_len_dwc, truncate_to_len
 log = logging.getLogger(__name__)
 
 MAX_KEYBINDING_LENGTH = 5
-MULTICHAR_KEYBINDINGS = (
-    "dd",
-    "sd",
-    "sp",
-    "sa",
-    "sv",
-    "sn",
-    "ns",
-    "ng",
-    "bp",
-)
+# (offset, text, attr) items of a row in the chat list
+ChatRow = Tuple[Tuple[int, str, int], ...]
 
 
 class Win:
@@ -68,8 +60,9 @@ class View:
         self.chats = chat_view
         self.msgs = msg_view
         self.status = status_view
-        self.max_read = 2048
         self.resize_handler = self.resize
+        # set while terminal is given to external program, e.g. editor
+        self.is_suspended = False
 
     def resize_stub(self) -> None:
         pass
@@ -78,12 +71,16 @@ class View:
         curses.endwin()
         self.stdscr.refresh()
 
-    def get_keys(self) -> Tuple[int, str]:
+    def get_keys(self, prefixes: FrozenSet[str]) -> Tuple[int, str]:
+        """
+        Reads keys until they don't form the beginning of a multichar
+        keybinding from prefixes
+        """
         keys = repeat_factor = ""
 
         for _ in range(MAX_KEYBINDING_LENGTH):
             ch = self.stdscr.getch()
-            log.info("raw ch without unctrl: %s", ch)
+            log.debug("raw ch without unctrl: %s", ch)
             try:
                 key = curses.unctrl(ch).decode()
             except Exception:
@@ -94,14 +91,32 @@ class View:
                 continue
             keys += key
             # if match found or there are not any shortcut matches at all
-            if all(
-                p == keys or not p.startswith(keys)
-                for p in MULTICHAR_KEYBINDINGS
-            ):
+            if keys not in prefixes:
                 break
 
         return cast(int, num(repeat_factor, default=1)), keys or "UNKNOWN"
 
+    def count_repeated_keys(self, keys: str) -> int:
+        """
+        Reads already typed keys while they are the same as given keys and
+        returns their number
+        """
+        count = 0
+        self.stdscr.nodelay(True)
+        try:
+            while (ch := self.stdscr.getch()) != -1:
+                try:
+                    key = curses.unctrl(ch).decode()
+                except Exception:
+                    key = ""
+                if key != keys:
+                    curses.ungetch(ch)
+                    break
+                count += 1
+        finally:
+            self.stdscr.nodelay(False)
+        return count
+
 
 class StatusView:
     def __init__(self, stdscr: window) -> None:
@@ -164,11 +179,20 @@ class ChatView:
         self.win = Win(stdscr.subwin(self.h, self.w, 0, 0))
         self._refresh = self.win.refresh
         self.model = model
+        # rows drawn on the screen, used to skip redrawing of unchanged rows
+        self._rendered: List[ChatRow] = []
+        # chat_id -> (last_message, parsed last msg), tdlib replaces
+        # last_message of a chat with a new dict on every change, so parsed
+        # msg is reused while the same dict is there
+        self._last_msgs: Dict[
+            int, Tuple[Optional[Dict[str, Any]], Tuple[Optional[int], str]]
+        ] = {}
 
     def resize(self, rows: int, cols: int, width: int) -> None:
         self.h = rows - 1
         self.w = width
         self.win.resize(self.h, self.w)
+        self._rendered = []
 
     def _msg_color(self, is_selected: bool = False) -> int:
         color = get_color(white, -1)
@@ -198,56 +222,82 @@ class ChatView:
     def draw(
         self, current: int, chats: List[Dict[str, Any]], title: str = "Chats"
     ) -> None:
-        self.win.erase()
         line = curses.ACS_VLINE  # type: ignore
         width = self.w - 1
 
+        if not self._rendered:
+            self.win.erase()
         self.win.vline(0, width, line, self.h)
-        self.win.addstr(
-            0, 0, title.center(width)[:width], get_color(cyan, -1) | bold
-        )
 
+        today = datetime.today().date()
+        rows: List[ChatRow] = [
+            ((0, title.center(width)[:width], get_color(cyan, -1) | bold),)
+        ]
         for i, chat in enumerate(chats, 1):
-            is_selected = i == current + 1
-            date = get_date(chat)
-            title = chat["title"]
-            offset = 0
-
-            last_msg_sender, last_msg = self._get_last_msg_data(chat)
-            sender_label = f" {last_msg_sender}" if last_msg_sender else ""
-            flags = self._get_flags(chat)
-            flags_len = string_len_dwc(flags)
-
-            if flags:
-                self.win.addstr(
-                    i,
+            rows.append(self._chat_row(i == current + 1, chat, width, today))
+
+        # redraw only rows that have changed since the previous draw, e.g.
+        # moving selection to the next chat touches only two rows
+        for i, row in enumerate(rows):
+            if i < len(self._rendered) and self._rendered[i] == row:
+                continue
+            self.win.addstr(i, 0, " " * width)
+            for offset, item, attr in row:
+                self.win.addstr(i, offset, item, attr)
+        for i in range(len(rows), len(self._rendered)):
+            self.win.addstr(i, 0, " " * width)
+        self._rendered = rows
+
+        self._refresh()
+
+    def _chat_row(
+        self, is_selected: bool, chat: Dict[str, Any], width: int, today: date
+    ) -> ChatRow:
+        row = []
+        msg_date = get_date(chat, today)
+        title = chat["title"]
+        offset = 0
+
+        last_msg_sender, last_msg = self._get_last_msg_data(chat)
+        sender_label = f" {last_msg_sender}" if last_msg_sender else ""
+        flags = self._get_flags(chat)
+        flags_len = string_len_dwc(flags)
+
+        if flags:
+            row.append(
+                (
                     max(0, width - flags_len),
                     truncate_to_len(flags, width)[-width:],
                     # flags[-width:],
                     self._unread_color(is_selected),
                 )
+            )
 
-            for attr, elem in zip(
-                self._chat_attributes(is_selected, title, last_msg_sender),
-                [f"{date} ", title, sender_label, f" {last_msg}"],
-            ):
-                if not elem:
-                    continue
-                item = truncate_to_len(
-                    elem, max(0, width - offset - flags_len)
-                )
+        for attr, elem in zip(
+            self._chat_attributes(is_selected, title, last_msg_sender),
+            [f"{msg_date} ", title, sender_label, f" {last_msg}"],
+        ):
+            if not elem:
+                continue
+            item = truncate_to_len(elem, max(0, width - offset - flags_len))
 
-                if len(item) > 1:
-                    self.win.addstr(i, offset, item, attr)
-                    offset += string_len_dwc(elem)
+            if len(item) > 1:
+                row.append((offset, item, attr))
+                offset += string_len_dwc(elem)
 
-        self._refresh()
+        return tuple(row)
 
     def _get_last_msg_data(
         self, chat: Dict[str, Any]
     ) -> Tuple[Optional[str], Optional[str]]:
-        user, last_msg = get_last_msg(chat, self.model.users)
-        last_msg = last_msg.replace("\n", " ")
+        last_message = chat.get("last_message")
+        cached = self._last_msgs.get(chat["id"])
+        if cached and cached[0] is last_message:
+            user, last_msg = cached[1]
+        else:
+            user, last_msg = get_last_msg(chat, self.model.users)
+            last_msg = last_msg.replace("\n", " ")
+            self._last_msgs[chat["id"]] = last_message, (user, last_msg)
         if user:
             last_msg_sender = self.model.users.get_user_label(user)
             chat_type = get_chat_type(chat)
@@ -295,7 +345,8 @@ class ChatView:
         if get_chat_type(chat) == ChatType.chatTypeSecret:
             flags.append("secret")
 
-        label = " ".join(config.CHAT_FLAGS.get(flag, flag) for flag in flags)
+        chat_flags = config.CHAT_FLAGS
+        label = " ".join(chat_flags.get(flag, flag) for flag in flags)
         if label:
             return f" {label}"
         return label
@@ -318,17 +369,20 @@ class MsgView:
             "messageSendingStateFailed": "failed",
             "messageSendingStatePending": "pending",
         }
+        # what was drawn last time: collected msgs and title
+        self._last_drawn: Optional[Tuple[Any, ...]] = None
 
     def resize(self, rows: int, cols: int, width: int) -> None:
+        # window is cleared on resize, so it must be drawn again
+        self._last_drawn = None
         self.h = rows - 1
         self.w = width
         self.x = cols - self.w
         self.win.resize(self.h, self.w)
         self.win.mvwin(0, self.x)
 
-    def _get_flags(self, msg_proxy: MsgProxy) -> str:
+    def _get_flags(self, msg_proxy: MsgProxy, chat: Dict[str, Any]) -> str:
         flags = []
-        chat = self.model.chats.chats[self.model.current_chat]
 
         if msg_proxy.msg_id in self.model.selected[chat["id"]]:
             flags.append("selected")
@@ -336,19 +390,20 @@ class MsgView:
         if msg_proxy.forward is not None:
             flags.append("forwarded")
 
+        is_my_msg = self.model.is_me(msg_proxy.sender_id)
         if (
-            not self.model.is_me(msg_proxy.sender_id)
+            not is_my_msg
             and msg_proxy.msg_id > chat["last_read_inbox_message_id"]
         ):
             flags.append("new")
         elif (
-            self.model.is_me(msg_proxy.sender_id)
+            is_my_msg
             and msg_proxy.msg_id > chat["last_read_outbox_message_id"]
         ):
             if not self.model.is_me(chat["id"]):
                 flags.append("unseen")
         elif (
-            self.model.is_me(msg_proxy.sender_id)
+            is_my_msg
             and msg_proxy.msg_id <= chat["last_read_outbox_message_id"]
         ):
             flags.append("seen")
@@ -361,7 +416,8 @@ class MsgView:
 
         if not flags:
             return ""
-        return " ".join(config.MSG_FLAGS.get(flag, flag) for flag in flags)
+        msg_flags = config.MSG_FLAGS
+        return " ".join(msg_flags.get(flag, flag) for flag in flags)
 
     def _format_reply_msg(
         self, chat_id: int, msg: str, reply_to: int, width_limit: int
@@ -434,6 +490,7 @@ class MsgView:
         current_msg_idx: int,
         msgs: List[Tuple[int, Dict[str, Any]]],
         min_msg_padding: int,
+        chat: Dict[str, Any],
     ) -> List[Tuple[Tuple[str, ...], bool, int]]:
         """
         Tries to collect list of messages that will satisfy `min_msg_padding`
@@ -445,40 +502,21 @@ class MsgView:
         """
         selected_item_idx: Optional[int] = None
         collected_items: List[Tuple[Tuple[str, ...], bool, int]] = []
+        # each retry below starts from the next msg, so format every msg
+        # only once and reuse it in the following retries
+        formatted: Dict[int, Tuple[Tuple[str, ...], str, int]] = {}
         for ignore_before in range(len(msgs)):
             if selected_item_idx is not None:
                 break
             collected_items = []
             line_num = self.h
-            for msg_idx, msg_item in msgs[ignore_before:]:
+            for pos, (msg_idx, msg_item) in enumerate(
+                msgs[ignore_before:], ignore_before
+            ):
                 is_selected_msg = current_msg_idx == msg_idx
-                msg_proxy = MsgProxy(msg_item)
-                dt = msg_proxy.date.strftime("%H:%M:%S")
-                user_id_item = msg_proxy.sender_id
-
-                user_id = self.model.users.get_user_label(user_id_item)
-                flags = self._get_flags(msg_proxy)
-                if user_id and flags:
-                    # if not channel add space between name and flags
-                    flags = f" {flags}"
-                label_elements = f" {dt} ", user_id, flags
-                label_len = sum(string_len_dwc(e) for e in label_elements)
-
-                msg = self._format_msg(
-                    msg_proxy, width_limit=self.w - label_len - 1
-                )
-                elements = *label_elements, f" {msg}"
-                needed_lines = 0
-                for i, msg_line in enumerate(msg.split("\n")):
-                    # count wide character utf-8 symbols that take > 1 bytes to
-                    # print it causes invalid offset
-                    line_len = string_len_dwc(msg_line)
-
-                    # first line cotains msg lable, e.g user name, date
-                    if i == 0:
-                        line_len += label_len
-
-                    needed_lines += (line_len // self.w) + 1
+                if pos not in formatted:
+                    formatted[pos] = self._format_msg_item(msg_item, chat)
+                elements, msg, needed_lines = formatted[pos]
 
                 line_num -= needed_lines
                 if line_num < 0:
@@ -509,6 +547,42 @@ class MsgView:
 
         return collected_items
 
+    def _format_msg_item(
+        self, msg_item: Dict[str, Any], chat: Dict[str, Any]
+    ) -> Tuple[Tuple[str, ...], str, int]:
+        """
+        Returns elements to draw, formatted msg and number of lines needed
+        to draw the msg
+        """
+        msg_proxy = MsgProxy(msg_item)
+        dt = msg_proxy.date.strftime("%H:%M:%S")
+        user_id_item = msg_proxy.sender_id
+
+        user_id = self.model.users.get_user_label(user_id_item)
+        flags = self._get_flags(msg_proxy, chat)
+        if user_id and flags:
+            # if not channel add space between name and flags
+            flags = f" {flags}"
+        label_elements = f" {dt} ", user_id, flags
+        label_len = sum(string_len_dwc(e) for e in label_elements)
+
+        msg = self._format_msg(msg_proxy, width_limit=self.w - label_len - 1)
+        elements = *label_elements, f" {msg}"
+        needed_lines = 0
+        width = self.w
+        for i, msg_line in enumerate(msg.split("\n")):
+            # count wide character utf-8 symbols that take > 1 bytes to
+            # print it causes invalid offset
+            line_len = string_len_dwc(msg_line)
+
+            # first line cotains msg lable, e.g user name, date
+            if i == 0:
+                line_len += label_len
+
+            needed_lines += (line_len // width) + 1
+
+        return elements, msg, needed_lines
+
     def draw(
         self,
         current_msg_idx: int,
@@ -516,14 +590,24 @@ class MsgView:
         min_msg_padding: int,
         chat: Dict[str, Any],
     ) -> None:
-        self.win.erase()
         msgs_to_draw = self._collect_msgs_to_draw(
-            current_msg_idx, msgs, min_msg_padding
+            current_msg_idx, msgs, min_msg_padding, chat
         )
 
         if not msgs_to_draw:
             log.error("Can't collect message for drawing!")
 
+        title = self._msg_title(chat)
+        # msgs are rendered on updates of other chats too, e.g. new msgs
+        # or typing, skip repainting when nothing visible has changed
+        drawn = (msgs_to_draw, title)
+        if drawn == self._last_drawn:
+            return
+        self._last_drawn = drawn
+
+        self.win.erase()
+
+        width, height = self.w, self.h
         for elements, selected, line_num in msgs_to_draw:
             column = 0
             user = elements[1]
@@ -532,13 +616,14 @@ class MsgView:
             ):
                 if not elem:
                     continue
-                lines = (column + string_len_dwc(elem)) // self.w
-                last_line = self.h == line_num + lines
+                elem_len = string_len_dwc(elem)
+                lines = (column + elem_len) // width
+                last_line = height == line_num + lines
                 # work around agaist curses behaviour, when you cant write
                 # char to the lower right coner of the window
                 # see https://stackoverflow.com/questions/21594778/how-to-fill-to-lower-right-corner-in-python-curses/27517397#27517397
                 if last_line:
-                    start, stop = 0, self.w - column
+                    start, stop = 0, width - column
                     for i in range(lines):
                         # insstr does not wraps long strings
                         self.win.insstr(
@@ -547,14 +632,12 @@ class MsgView:
                             elem[start:stop],
                             attr,
                         )
-                        start, stop = stop, stop + self.w
+                        start, stop = stop, stop + width
                 else:
                     self.win.addstr(line_num, column, elem, attr)
-                column += string_len_dwc(elem)
+                column += elem_len
 
-        self.win.addstr(
-            0, 0, self._msg_title(chat), get_color(cyan, -1) | bold
-        )
+        self.win.addstr(0, 0, title, get_color(cyan, -1) | bold)
 
         self._refresh()
 
@@ -615,15 +698,20 @@ def get_last_msg(
     )
 
 
-def get_date(chat: Dict[str, Any]) -> str:
+def get_date(chat: Dict[str, Any], today: date) -> str:
     last_msg = chat.get("last_message")
     if not last_msg:
         return "<No date>"
-    dt = datetime.fromtimestamp(last_msg["date"])
+    return format_date(last_msg["date"], today)
+
+
+@lru_cache(maxsize=1024)
+def format_date(timestamp: int, today: date) -> str:
+    dt = datetime.fromtimestamp(timestamp)
     date_fmt = "%d %b %y"
-    if datetime.today().date() == dt.date():
+    if today == dt.date():
         date_fmt = "%H:%M"
-    elif datetime.today().year == dt.year:
+    elif today.year == dt.year:
         date_fmt = "%d %b"
     return dt.strftime(date_fmt)
 